@@ -1,11 +1,15 @@
 import csv
 import json
+import sys
+from collections import Counter
+from itertools import combinations
 
 def parse_list_field(field):
-    """Split a comma-separated string into a list, stripping whitespace and omitting empty values."""
+    """Split a comma-separated string into a list, stripping whitespace and omitting empty values.
+    The names are interned, so a name repeated across many titles is stored only once."""
     if not field or not field.strip():
         return []
-    return [item.strip() for item in field.split(',') if item.strip()]
+    return [sys.intern(item.strip()) for item in field.split(',') if item.strip()]
 
 def calculate_decade(year_str):
     """Convert a year string to the first year of its decade, or None if invalid."""
@@ -15,24 +19,161 @@ def calculate_decade(year_str):
     except (ValueError, TypeError):
         return None
 
-def process_row(row):
-    """Extract and transform relevant fields from a TSV row."""
-    return {
-        'title': row['PRIMARYTITLE'],
-        'directors': parse_list_field(row['DIRECTOR']),
-        'cast': parse_list_field(row['CAST']),
-        'genres': parse_list_field(row['GENRES']),
-        'decade': calculate_decade(row['STARTYEAR'])
-    }
-
-
-input_file = 'netflix_titles.tsv'
-output_file = 'hw02_output.json'
-result = []
-with open(input_file, encoding='utf-8') as tsvfile:
-    reader = csv.DictReader(tsvfile, delimiter='\t')
-    for row in reader:
-        result.append(process_row(row))
-with open(output_file, 'w', encoding='utf-8') as jsonfile:
-    json.dump(result, jsonfile, ensure_ascii=False, indent=2)
+# how each output field is computed from a TSV row; a field is only computed when it is requested
+FIELD_PARSERS = {
+    'title': lambda row: row['PRIMARYTITLE'],
+    'directors': lambda row: parse_list_field(row['DIRECTOR']),
+    'cast': lambda row: parse_list_field(row['CAST']),
+    'genres': lambda row: parse_list_field(row['GENRES']),
+    'decade': lambda row: calculate_decade(row['STARTYEAR']),
+}
+ALL_FIELDS = tuple(FIELD_PARSERS)
 
+def process_row(row, fields=ALL_FIELDS):
+    """Extract and transform the requested fields from a TSV row."""
+    return {field: FIELD_PARSERS[field](row) for field in fields}
+
+def read_rows(input_file):
+    """Yield the rows of the TSV file one by one."""
+    with open(input_file, encoding='utf-8') as tsvfile:
+        yield from csv.DictReader(tsvfile, delimiter='\t')
+
+
+# number of counters per decade; more than the distinct names in any decade of the bundled TSV,
+# so its counts are exact, while the memory stays bounded for larger catalogs
+TOP_CAPACITY = 10000
+
+
+class TopCounter:
+    """Count items and keep at most `capacity` counters (Space-Saving), so the memory is bounded.
+    A new item with no free counter takes over the counter of a least counted item, and that count
+    becomes its possible error: the true count is between count - error and count.
+    The counts are exact (error 0) while there are at most `capacity` distinct items."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # count -> items with that count (a dict keeps the order, so the evicted item does not depend on hashing)
+        self.buckets = {}
+        self.min_count = 0
+
+    def _increment(self, item):
+        count = self.counts[item]
+        bucket = self.buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+        self.buckets.setdefault(count + 1, {})[item] = None
+        self.counts[item] = count + 1
+
+    def add(self, item):
+        if item not in self.counts:
+            if len(self.counts) < self.capacity:
+                count, error = 0, 0
+            else:
+                # no room for the new item: it replaces the oldest of the least counted items
+                count = error = self.min_count
+                evicted = next(iter(self.buckets[count]))
+                del self.buckets[count][evicted], self.counts[evicted], self.errors[evicted]
+            self.counts[item] = count
+            self.errors[item] = error
+            self.buckets.setdefault(count, {})[item] = None
+            self.min_count = count
+        self._increment(item)
+
+    def most_common(self, n):
+        """The n items with the highest counts as (item, count, error)."""
+        top = sorted(self.counts.items(), key=lambda item_count: -item_count[1])[:n]
+        return [(item, count, self.errors[item]) for item, count in top]
+
+
+class TopPerDecade:
+    """Top N values of a list field (e.g. cast) per decade, with the count and its maximum error."""
+
+    def __init__(self, field, n=10, capacity=TOP_CAPACITY):
+        self.field = field
+        self.n = n
+        self.capacity = capacity
+        self.fields = ('decade', field)
+        self.counters = {}
+
+    def add(self, record):
+        counter = self.counters.setdefault(record['decade'], TopCounter(self.capacity))
+        for value in record[self.field]:
+            counter.add(value)
+
+    def result(self):
+        # decades as strings, "unknown" for titles without a valid year
+        return {
+            str(decade) if decade is not None else 'unknown': {
+                value: {'count': count, 'max_error': error}
+                for value, count, error in self.counters[decade].most_common(self.n)
+            }
+            for decade in sorted(self.counters, key=lambda decade: (decade is None, decade))
+        }
+
+
+class GenreCooccurrence:
+    """How many titles have each pair of genres."""
+
+    def __init__(self, n=20):
+        self.n = n
+        self.fields = ('genres',)
+        # the number of genres is small, so the number of pairs is bounded
+        self.pair_counts = Counter()
+
+    def add(self, record):
+        self.pair_counts.update(combinations(sorted(set(record['genres'])), 2))
+
+    def result(self):
+        # genres never contain a comma, they are split on it
+        return {f"{first}, {second}": count for (first, second), count in self.pair_counts.most_common(self.n)}
+
+
+class JsonArrayWriter:
+    """Write the records to a JSON array as they come, without keeping them in memory.
+    The output is the same as json.dump of the whole list with indent=2."""
+
+    def __init__(self, jsonfile, fields=ALL_FIELDS):
+        self.jsonfile = jsonfile
+        self.fields = fields
+        self.count = 0
+
+    def add(self, record):
+        item = json.dumps({field: record[field] for field in self.fields}, ensure_ascii=False, indent=2)
+        self.jsonfile.write(('[\n  ' if self.count == 0 else ',\n  ') + item.replace('\n', '\n  '))
+        self.count += 1
+
+    def result(self):
+        self.jsonfile.write('\n]' if self.count else '[]')
+        return self.count
+
+
+def run_pipeline(rows, aggregators):
+    """Feed every row to all the aggregators in a single pass; only the fields they need are parsed."""
+    fields = tuple(field for field in ALL_FIELDS if any(field in aggregator.fields for aggregator in aggregators.values()))
+    for row in rows:
+        record = process_row(row, fields)
+        for aggregator in aggregators.values():
+            aggregator.add(record)
+    return {name: aggregator.result() for name, aggregator in aggregators.items()}
+
+
+if __name__ == "__main__":
+    input_file = 'netflix_titles.tsv'
+    output_file = 'hw02_output.json'
+    aggregates_file = 'hw02_aggregates.json'
+    with open(output_file, 'w', encoding='utf-8') as jsonfile:
+        result = run_pipeline(read_rows(input_file), {
+            'titles': JsonArrayWriter(jsonfile),
+            'top_directors_per_decade': TopPerDecade('directors'),
+            'top_cast_per_decade': TopPerDecade('cast'),
+            'top_genres_per_decade': TopPerDecade('genres'),
+            'genre_cooccurrence': GenreCooccurrence(),
+        })
+    del result['titles']
+    with open(aggregates_file, 'w', encoding='utf-8') as jsonfile:
+        json.dump(result, jsonfile, ensure_ascii=False, indent=2)
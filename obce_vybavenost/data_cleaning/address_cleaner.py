@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 import chardet
+from schemas import conform, write_stage
 
 
 # Define the directory containing the CSV files
@@ -71,19 +72,28 @@ combined_df = pd.read_csv(output_file_path, encoding='utf-8', header=0, sep=';')
 # Select only the relevant columns and rename them
 combined_df = combined_df[list(relevant_columns.keys())].rename(columns=relevant_columns)
 
+# validate against the schema once, the writers below get the validated table and do not convert it again
+addresses_table = conform(combined_df, 'addresses')
+
 # save the cleaned dataset
 output_file_path = os.path.join(output_directory, "combined_addresses_cz_cleaned.csv")
-combined_df.to_csv(output_file_path, index=False, encoding='utf-8')
+write_stage(addresses_table, output_file_path, 'addresses')
 print(f"Cleaned CSV file saved to {output_file_path}")
 
+# also save it as an Arrow IPC file which the enrichers can memory map instead of parsing the CSV
+arrow_file_path = os.path.join(output_directory, "combined_addresses_cz_cleaned.arrow")
+write_stage(addresses_table, arrow_file_path, 'addresses')
+print(f"Cleaned Arrow file saved to {arrow_file_path}")
+
 # also save the cleaned dataset in 100MB chunks to meet github file size limit
 output_directory = "data/clean/"
 chunk_size = 800000  # 1 million rows per chunk
 chunk_count = 0
-for i in range(0, len(combined_df), chunk_size):
-    chunk = combined_df.iloc[i:i + chunk_size]
+for i in range(0, addresses_table.num_rows, chunk_size):
+    # a slice of the table shares its memory and keeps the schema
+    chunk = addresses_table.slice(i, chunk_size)
     chunk_file_path = os.path.join(output_directory, f"combined_addresses_cz_cleaned_chunk_{chunk_count}.csv")
-    chunk.to_csv(chunk_file_path, index=False, encoding='utf-8')
+    write_stage(chunk, chunk_file_path, 'addresses')
     print(f"Cleaned CSV file chunk {chunk_count} saved to {chunk_file_path}")
     chunk_count += 1
 
@@ -0,0 +1,188 @@
+"""
+this script is used to find pickup points of different providers which sit at the same place
+e.g. the post office, the Alzaboxes and the Z-BOX in "Palác Pardubice" on Masarykovo náměstí 2799
+it reads the enriched datasets (data/clean/*_enriched.csv) and:
+1. unifies them into one table of points with provider, point_id, city_code, address and coordinates
+   point_id is unique within the provider (postal_code for posta), the AMD code of posta is kept as ruian_code
+2. builds a normalized address key (city, street, building_number)
+   e.g. "Masarykovo nám." / "Masarykovo náměstí", "2799.0" / "2799" give the same key
+3. puts the points with coordinates into a grid of cells of N metres and pairs points
+   from the same or neighbouring cells which are at most N metres apart
+4. joins points sharing the address key or close to each other into clusters (cluster_id)
+5. saves the points with their cluster_id (data/clean/colocated_points.csv)
+   the distinct locations per municipality are counted by query.py (coverage)
+   run it again whenever the enriched datasets change, query.py ignores an output older than them
+posta has no coordinates, so post offices are only clustered by the address key
+"""
+
+import numpy as np
+import pandas as pd
+
+from providers import PROVIDERS
+from schemas import read_stage
+
+# points closer than this are considered to be at the same location
+MAX_DISTANCE_METRES = 75
+
+# mean Earth radius used to turn degrees into metres
+EARTH_RADIUS_METRES = 6371000
+
+UNIFIED_COLUMNS = ['provider', 'point_id', 'name', 'city_code', 'city', 'street', 'building_number', 'ruian_code', 'longitude', 'latitude']
+
+
+def unify_provider_points(provider: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Select the columns shared by all providers; missing coordinates are filled with NaN
+    ruian_code is only selected if the provider has it, the other providers get it from the concatenation
+    """
+    df = df.assign(point_id=df[PROVIDERS[provider].id_column], provider=provider)
+    for column in ['longitude', 'latitude']:
+        if column not in df.columns:
+            df[column] = np.nan
+    return df[[column for column in UNIFIED_COLUMNS if column in df.columns]]
+
+
+def build_address_key(points_df: pd.DataFrame) -> pd.Series:
+    """
+    Build the normalized (city, street, building_number) key
+    1. lower case, strip and collapse whitespace
+    2. replace "nám." with "náměstí"
+    3. remove city part number if exists; e.g. "Praha 1" -> "praha"
+    4. if street is empty or the same as city, then the street is empty
+    5. building number without the ".0" of older float outputs; e.g. "421.0" -> "421"
+    points without a building number get no key (NaN)
+    """
+    def normalize(series: pd.Series) -> pd.Series:
+        series = series.fillna('').astype(str).str.lower().str.strip()
+        series = series.str.replace(r'\bnám\.\s*', 'náměstí ', regex=True)
+        return series.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+    city = normalize(points_df['city']).str.replace(r'\s\d+$', '', regex=True)
+    street = normalize(points_df['street'])
+    street = street.where(street != city, '')
+    building_number = normalize(points_df['building_number']).str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+    key = city + '|' + street + '|' + building_number
+    return key.where((building_number != '') & (city != ''))
+
+
+def project_to_metres(longitude: pd.Series, latitude: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """ Equirectangular projection around the mean latitude; accurate enough for distances of a few hundred metres """
+    lon = np.radians(longitude.to_numpy(dtype=float))
+    lat = np.radians(latitude.to_numpy(dtype=float))
+    mean_lat = np.nanmean(lat) if len(lat) else 0.0
+    x = EARTH_RADIUS_METRES * lon * np.cos(mean_lat)
+    y = EARTH_RADIUS_METRES * lat
+    return x, y
+
+
+def find_close_pairs(points_df: pd.DataFrame, max_distance: float = MAX_DISTANCE_METRES) -> np.ndarray:
+    """
+    Return an (n, 2) array of row positions of points at most max_distance metres apart
+    the points are hashed into square grid cells of max_distance metres,
+    so only points in the same or neighbouring cells have to be compared
+    """
+    has_coordinates = points_df['longitude'].notna().to_numpy() & points_df['latitude'].notna().to_numpy()
+    positions = np.flatnonzero(has_coordinates)
+    if len(positions) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+
+    x, y = project_to_metres(points_df['longitude'].iloc[positions], points_df['latitude'].iloc[positions])
+    grid_df = pd.DataFrame({
+        'position': positions,
+        'x': x,
+        'y': y,
+        'cell_x': np.floor(x / max_distance).astype(np.int64),
+        'cell_y': np.floor(y / max_distance).astype(np.int64),
+    })
+
+    pairs = []
+    # comparing with half of the neighbouring cells (and the own cell) finds every pair exactly once
+    for offset_x, offset_y in [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]:
+        neighbours_df = grid_df.assign(cell_x=grid_df['cell_x'] - offset_x, cell_y=grid_df['cell_y'] - offset_y)
+        candidates_df = pd.merge(grid_df, neighbours_df, on=['cell_x', 'cell_y'], suffixes=('_a', '_b'))
+        if (offset_x, offset_y) == (0, 0):
+            candidates_df = candidates_df[candidates_df['position_a'] < candidates_df['position_b']]
+        distance = np.hypot(candidates_df['x_a'] - candidates_df['x_b'], candidates_df['y_a'] - candidates_df['y_b'])
+        candidates_df = candidates_df[distance <= max_distance]
+        pairs.append(candidates_df[['position_a', 'position_b']].to_numpy())
+
+    return np.concatenate(pairs)
+
+
+def find_same_address_pairs(address_key: pd.Series) -> np.ndarray:
+    """ Return an (n, 2) array of row positions sharing the address key; each point is paired with the first one of its key """
+    key_df = pd.DataFrame({'key': address_key.to_numpy(), 'position': np.arange(len(address_key))}).dropna()
+    first_position = key_df.groupby('key')['position'].transform('min')
+    key_df = key_df[key_df['position'] != first_position]
+    return np.column_stack([first_position[key_df.index].to_numpy(), key_df['position'].to_numpy()]).astype(np.int64)
+
+
+def connected_components(point_count: int, pairs: np.ndarray) -> np.ndarray:
+    """
+    Label the points so that points connected by pairs share a label
+    every point starts with its own position as a label and the smallest label
+    is propagated along the pairs until nothing changes
+    """
+    labels = np.arange(point_count)
+    if len(pairs) == 0:
+        return labels
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        smaller = np.minimum(labels[a], labels[b])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, a, smaller)
+        np.minimum.at(new_labels, b, smaller)
+        # jump to the label of the label to shorten long chains
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def cluster_points(points_df: pd.DataFrame, max_distance: float = MAX_DISTANCE_METRES) -> pd.DataFrame:
+    """ Add address_key and cluster_id columns; cluster_id is numbered from 0 in the order of first appearance """
+    points_df = points_df.reset_index(drop=True)
+    points_df['address_key'] = build_address_key(points_df)
+
+    pairs = np.concatenate([
+        find_close_pairs(points_df, max_distance),
+        find_same_address_pairs(points_df['address_key']),
+    ])
+    labels = connected_components(len(points_df), pairs)
+
+    # renumber the labels to consecutive cluster ids
+    points_df['cluster_id'] = pd.factorize(labels)[0]
+    return points_df
+
+
+def colocate_points(input_files: dict, output_file: str, max_distance: float = MAX_DISTANCE_METRES) -> pd.DataFrame:
+    """
+    Cluster the points of all providers and save them with their cluster_id
+    input_files maps the provider name to its enriched dataset (a file or the table handed over in process)
+    """
+    points_df = pd.concat(
+        [unify_provider_points(provider, read_stage(input_file, f"{provider}_enriched")) for provider, input_file in input_files.items()],
+        ignore_index=True,
+    )[UNIFIED_COLUMNS]
+    points_df = cluster_points(points_df, max_distance)
+
+    # print how many points share a location with another point
+    cluster_sizes = points_df['cluster_id'].map(points_df['cluster_id'].value_counts())
+    print(f"Number of distinct locations: {points_df['cluster_id'].nunique()} for {len(points_df)} points, "
+          f"{(cluster_sizes > 1).sum()} points share their location with another point")
+
+    # Save the clustered dataset
+    points_df.to_csv(output_file, index=False)
+    return points_df
+
+
+# usage
+if __name__ == "__main__":
+    input_paths = {
+        'posta': "data/clean/posta_enriched.csv",
+        'alzabox': "data/clean/alzaboxes_enriched.csv",
+        'zasilkovna': "data/clean/zasilkovna_enriched.csv",
+    }
+    output_path = "data/clean/colocated_points.csv"
+    colocate_points(input_paths, output_path)
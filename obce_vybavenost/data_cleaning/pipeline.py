@@ -0,0 +1,61 @@
+"""
+this script runs the cleaning and enrichment stages of all registered providers (providers.py) in one process
+the stages hand the Arrow tables over directly, so the data is not written to CSV and parsed again
+between the stages; every handover is validated against the dataset schema (schemas.py)
+the adresy_cr dataset is read only once and shared by the enrichers
+the providers run in a thread pool; the cleaning and merging is pandas work which mostly holds the GIL,
+so the threads only help where a provider waits for I/O, i.e. the RUIAN lookups of posta overlap with the other providers
+only the final enriched datasets are saved, as CSV (default) or as Arrow IPC files (.arrow)
+the posta enrichment calls the RUIAN web service for every post office, so it only runs with --posta
+usage:
+    python data_cleaning/pipeline.py [--posta] [--format csv|arrow]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from provider_engine import clean_provider_data, enrich_provider_data, load_addresses
+from providers import PROVIDERS
+
+RAW_PATHS = {
+    'posta': "data/raw/posta.csv",
+    'alzabox': "data/raw/alzaboxes_cz.xlsx",
+    'zasilkovna': "data/raw/zasilkovna_data.xlsx",
+}
+OUTPUT_NAMES = {
+    'posta': "posta_enriched",
+    'alzabox': "alzaboxes_enriched",
+    'zasilkovna': "zasilkovna_enriched",
+}
+ADRESY_PATH = "data/clean/adresy_cr/combined_addresses_cz_cleaned.csv"
+OUTPUT_DIRECTORY = "data/clean/"
+
+
+def run_provider(name, addresses_df, output_directory, output_format):
+    """ Clean and enrich one provider, the cleaned table goes straight to the enricher """
+    adapter = PROVIDERS[name]
+    cleaned_table = clean_provider_data(adapter, RAW_PATHS[name], None)
+    output_file = f"{output_directory}{OUTPUT_NAMES.get(name, f'{name}_enriched')}.{output_format}"
+    return enrich_provider_data(adapter, cleaned_table, addresses_df, output_file)
+
+
+def run_pipeline(adresy_file=ADRESY_PATH, output_directory=OUTPUT_DIRECTORY, output_format='csv', enrich_posta=False, max_workers=4):
+    """ Clean and enrich all the providers, returns the enriched Arrow tables by provider name """
+    names = [name for name in PROVIDERS if name in RAW_PATHS and (enrich_posta or PROVIDERS[name].enrich_strategy != 'ruian_code')]
+
+    # read the columns needed by the enrichers once
+    addresses_df = load_addresses(adresy_file)
+
+    # the threads overlap the waiting for the RUIAN web service, not the CPU bound cleaning
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(run_provider, name, addresses_df, output_directory, output_format) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean and enrich the pickup point datasets in one process")
+    parser.add_argument('--posta', action='store_true', help="also enrich the post offices using the RUIAN web service")
+    parser.add_argument('--format', choices=['csv', 'arrow'], default='csv', help="format of the enriched outputs")
+    args = parser.parse_args()
+    run_pipeline(output_format=args.format, enrich_posta=args.posta)
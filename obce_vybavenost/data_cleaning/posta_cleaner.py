@@ -5,34 +5,12 @@ it reads data from the posta raw dataset (data/raw/posta.csv) and cleans the dat
     e.g. "Komenského nám." will be replaced with "Komenského náměstí"
 """
 
-import pandas as pd
+from provider_engine import clean_provider_data
+from providers import POSTA
 
 def clean_post_office_data(input_file, output_file):
-    # Read the raw dataset
-    df = pd.read_csv(input_file, sep=';', encoding='windows-1250', skiprows=1)
-
-    # select only the relevant columns and rename them
-    relevant_columns = {
-        
-        'NAZ_PROVOZOVNY': 'name',
-        'OBEC': 'city',
-        'PSC': 'postal_code',
-        'NAZ_ULICE': 'street',
-        'CISLO_POP': 'building_number',
-        'CISLO_OR': 'orientation_number',
-        'KOD_RUIAN': 'ruian_code',        
-    }
-    df = df[list(relevant_columns.keys())].rename(columns=relevant_columns)
-
-    # Replace 'nám.' or 'nám.' with 'náměstí' in the street column
-    df['street'] = df['street'].str.replace(r'\bnám\.\s*', 'náměstí ', regex=True)
-
-    # Remove leading and trailing spaces
-    df['street'] = df['street'].str.strip()    
-
-    
-    # Save the cleaned dataset
-    df.to_csv(output_file, index=False)
+    # the cleaning steps are shared by all providers, see provider_engine.py and providers.py
+    return clean_provider_data(POSTA, input_file, output_file)
 
 # usage
 if __name__ == "__main__":
@@ -1,33 +1,56 @@
-import time
 import pandas as pd
-from ruian_client import get_city_code_by_ruian_code
+import pyarrow as pa
+from provider_engine import RUIAN_MAX_WORKERS
+from ruian_client import get_city_codes_by_ruian_codes
+from schemas import conform, read_stage, to_dataframe, write_stage
+
+CHUNK_SIZE = 50
 
 def enrich_posta_data(posta_file, output_file):
-    # Process the posta_file in chunks of 50
-    chunk_iter = pd.read_csv(posta_file, chunksize=50)
-    first_chunk = True
+    # Read the cleaned posta dataset (a file or the table handed over from the cleaner)
+    posta_df = read_stage(posta_file, 'posta')
+    missing_count = int(posta_df['ruian_code'].isna().sum())
+    if missing_count:
+        print(f"Missing ruian_code for {missing_count} rows, setting city_code to None")
+
+    # all the codes go to one lookup, so the requests keep overlapping across the chunks;
+    # the results come back in the order of the first appearance of each code
+    lookups = get_city_codes_by_ruian_codes(
+        [int(ruian_code) for ruian_code in posta_df['ruian_code'].dropna().unique()], max_workers=RUIAN_MAX_WORKERS
+    )
+    city_codes = {}
+
+    # Process the posta dataset in chunks of 50
+    # a CSV output is written chunk by chunk as soon as its codes are back, so the progress is kept if the lookup is interrupted
+    append_csv = output_file is not None and not str(output_file).endswith('.arrow')
+    tables = []
     total_processed = 0
-    for chunk in chunk_iter:
-        for index, row in chunk.iterrows():
-            # process each row
-            ruian_code = row.get('ruian_code')
-            if pd.notna(ruian_code):
-                city_code = get_city_code_by_ruian_code(int(ruian_code))                
-                chunk.at[index, 'city_code'] = city_code
-                print(f"Found city_code {city_code} for ruian_code {ruian_code}")
-            else:
-                chunk.at[index, 'city_code'] = None
-                print(f"Missing ruian_code for row {index}, setting city_code to None")
-            time.sleep(1)
-        # Save the chunk to the output file
-        if first_chunk:
-            chunk.to_csv(output_file, index=False, mode='w')
-            first_chunk = False
-        else:
-            chunk.to_csv(output_file, index=False, mode='a', header=False)
+    for start in range(0, len(posta_df), CHUNK_SIZE):
+        chunk = posta_df.iloc[start:start + CHUNK_SIZE]
+        # wait only for the codes of this chunk, the lookups of the next chunks keep running meanwhile
+        for ruian_code in chunk['ruian_code'].dropna():
+            while int(ruian_code) not in city_codes:
+                found_code, city_code = next(lookups)
+                print(f"Found city_code {city_code} for ruian_code {found_code}")
+                city_codes[found_code] = city_code
+        chunk = chunk.assign(city_code=pd.array(
+            [city_codes[int(ruian_code)] if pd.notna(ruian_code) else None for ruian_code in chunk['ruian_code']],
+            dtype='Int64',
+        ))
+
+        # Validate the chunk against the schema and save it to the output file
+        table = conform(chunk, 'posta_enriched')
+        if append_csv:
+            to_dataframe(table).to_csv(output_file, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+        tables.append(table)
         total_processed += len(chunk)
     print(f"All chunks processed. Total rows: {total_processed}")
 
+    enriched_table = pa.concat_tables(tables) if tables else conform(posta_df.assign(city_code=None), 'posta_enriched')
+    if append_csv:
+        return enriched_table
+    return write_stage(enriched_table, output_file, 'posta_enriched')
+
 # Example usage
 if __name__ == "__main__":
     posta_path = "data/clean/posta_cleaned.csv"    
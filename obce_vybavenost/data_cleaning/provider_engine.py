@@ -0,0 +1,260 @@
+"""
+this module is the shared cleaning and enrichment engine for all pickup point providers
+a provider is described by a ProviderAdapter (see providers.py) and the engine does the rest:
+1. reads the raw feed in batches (CSV chunk by chunk, Excel row by row in openpyxl read-only mode),
+   so only one batch of the raw feed is in memory at a time
+2. runs the provider's parse hook, e.g. to unpack the address dictionary of zasilkovna
+3. selects and renames the columns by the field mapping
+4. splits the address into street and number, e.g. "Náměstí Svobody 85/16" -> "Náměstí Svobody", "85/16"
+5. splits the number into building and orientation number, e.g. "85/16" -> "85", "16"
+6. replaces "nám." with "náměstí" and strips the street
+7. validates every batch against the provider's schema (schemas.py)
+enrichment adds city_code by one of the strategies:
+- 'city_postal_code': merge with the adresy_cr dataset on the city and postal code
+- 'city_street': merge on the city where the city has one city_code, otherwise on the city and street
+- 'ruian_code': look the city_code up in the RUIAN web service by the AMD code, see ruian_client.py
+all the steps work on whole columns, no row by row processing
+"""
+
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Optional
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+
+from ruian_client import get_city_codes_by_ruian_codes
+from schemas import SCHEMAS, conform, read_stage, write_stage
+
+ENRICH_STRATEGIES = ['city_postal_code', 'city_street', 'ruian_code']
+
+# columns of the adresy_cr dataset used by the enrichment strategies
+ADDRESS_COLUMNS = ['city_code', 'city', 'street', 'postal_code']
+
+# number of AMD pages downloaded at the same time
+RUIAN_MAX_WORKERS = 4
+
+
+@dataclass
+class ProviderAdapter:
+    """ Declarative description of a pickup point provider """
+    name: str  # dataset name, the schemas are registered as <name> and <name>_enriched
+    id_column: str  # column identifying a pickup point, e.g. 'branch_code'
+    field_mapping: dict  # raw column -> schema column
+    schema: Optional[pa.Schema] = None  # schema of the cleaned dataset, if not declared in schemas.py
+    read_options: dict = field(default_factory=dict)  # passed to pd.read_csv; sheet_name and skiprows for Excel
+    parse: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None  # hook run on the raw batch before the mapping
+    address_column: Optional[str] = None  # mapped column with "street number" to split
+    split_number: bool = True  # split building_number on "/" into building and orientation number
+    enrich_strategy: str = 'city_postal_code'
+    batch_size: int = 10000
+
+
+def register_schema(adapter: ProviderAdapter):
+    """ Register the schemas of the cleaned and enriched dataset of the provider """
+    if adapter.enrich_strategy not in ENRICH_STRATEGIES:
+        raise ValueError(f"Unknown enrich strategy {adapter.enrich_strategy}, expected one of {ENRICH_STRATEGIES}")
+    if adapter.schema is not None:
+        SCHEMAS[adapter.name] = adapter.schema
+        SCHEMAS[f"{adapter.name}_enriched"] = adapter.schema.append(pa.field('city_code', pa.int64()))
+    elif adapter.name not in SCHEMAS:
+        raise ValueError(f"Provider {adapter.name} has no schema")
+
+
+# --- shared cleaning steps ---
+
+def normalize_street(street: pd.Series) -> pd.Series:
+    """ Replace 'nám.' with 'náměstí' (at the end or in the middle of the name) and strip the spaces """
+    return street.str.replace(r'\bnám\.\s*', 'náměstí ', regex=True).str.strip()
+
+
+def split_street_and_number(address: pd.Series) -> pd.DataFrame:
+    """ Split "Náměstí Svobody 85/16" into street "Náměstí Svobody" and number "85/16" """
+    return address.str.extract(r'(.+?)\s+(\d+/\d+|\d+)').set_axis(['street', 'building_number'], axis=1)
+
+
+def split_number(number: pd.Series) -> pd.DataFrame:
+    """ Split "85/16" into building number "85" and orientation number "16"; without "/" there is no orientation number """
+    return number.str.extract(r'^([^/]*)(?:/(.*))?$').set_axis(['building_number', 'orientation_number'], axis=1)
+
+
+def city_key(city: pd.Series) -> pd.Series:
+    """ Lower case city without the city part number, e.g. "Praha 1" -> "praha" """
+    return city.str.lower().str.replace(r'\s\d+', '', regex=True)
+
+
+def read_excel_batches(input_file: str, batch_size: int, sheet_name=0, skiprows: int = 0):
+    """
+    Yield the sheet in DataFrames of batch_size rows, the first row (after skiprows) is the header
+    the workbook is opened in read-only mode, so the rows are parsed as they are read instead of loading the whole sheet
+    """
+    workbook = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = sheet.iter_rows(min_row=skiprows + 1, values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            # rows without any value, e.g. the formatted but empty rows at the end of the sheet, are skipped
+            batch = [row for row in batch if any(value is not None for value in row)]
+            if batch:
+                yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def read_raw_batches(adapter: ProviderAdapter, input_file: str):
+    """ Yield the raw feed in batches of adapter.batch_size rows """
+    if str(input_file).endswith('.xlsx'):
+        yield from read_excel_batches(input_file, adapter.batch_size, **adapter.read_options)
+    elif str(input_file).endswith('.xls'):
+        # the old binary format is not supported by openpyxl, it is read at once
+        df = pd.read_excel(input_file, **adapter.read_options)
+        for start in range(0, len(df), adapter.batch_size):
+            yield df.iloc[start:start + adapter.batch_size]
+    else:
+        yield from pd.read_csv(input_file, chunksize=adapter.batch_size, **adapter.read_options)
+
+
+def clean_batch(adapter: ProviderAdapter, df: pd.DataFrame) -> pa.Table:
+    """ Run the cleaning steps on one raw batch and validate it against the schema """
+    if adapter.parse is not None:
+        df = adapter.parse(df)
+
+    # select only the relevant columns and rename them
+    df = df[list(adapter.field_mapping.keys())].rename(columns=adapter.field_mapping)
+
+    if adapter.address_column is not None:
+        df[['street', 'building_number']] = split_street_and_number(df[adapter.address_column])
+
+    if adapter.split_number:
+        df[['building_number', 'orientation_number']] = split_number(df['building_number'].astype('string'))
+
+    df['street'] = normalize_street(df['street'].astype('string'))
+
+    return conform(df, adapter.name)
+
+
+def clean_provider_data(adapter: ProviderAdapter, input_file: str, output_file: Optional[str]) -> pa.Table:
+    """ Clean the raw feed of the provider, save it if output_file is given and return the validated table """
+    tables = [clean_batch(adapter, batch) for batch in read_raw_batches(adapter, input_file)]
+    table = pa.concat_tables(tables) if tables else conform(pd.DataFrame(columns=SCHEMAS[adapter.name].names), adapter.name)
+    return write_stage(table, output_file, adapter.name)
+
+
+# --- shared enrichment steps ---
+
+def _file_version(path: str) -> float:
+    return os.path.getmtime(path)
+
+
+@lru_cache(maxsize=4)
+def _read_addresses_file(path: str, version: float) -> pd.DataFrame:
+    # version is only part of the cache key, a changed file is read again
+    return read_stage(path, 'addresses', columns=ADDRESS_COLUMNS)
+
+
+def load_addresses(adresy_file) -> pd.DataFrame:
+    """ Read the columns of the adresy_cr dataset used for the enrichment; a file is read once and cached """
+    if isinstance(adresy_file, (pd.DataFrame, pa.Table)):
+        # handed over in process, possibly with only some of the columns
+        names = adresy_file.column_names if isinstance(adresy_file, pa.Table) else adresy_file.columns
+        return read_stage(adresy_file, 'addresses', columns=[column for column in ADDRESS_COLUMNS if column in names])
+    return _read_addresses_file(str(adresy_file), _file_version(adresy_file))
+
+
+def enrich_by_city_and_postal_code(points_df: pd.DataFrame, addresses_df: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """ Merge the points with the adresy_cr dataset on the city and postal code columns (case insensitive) """
+    addresses_df = addresses_df[['city_code', 'city', 'postal_code']].drop_duplicates()
+    addresses_df = addresses_df.assign(city_lower=addresses_df['city'].str.lower())[['city_lower', 'postal_code', 'city_code']]
+
+    points_df = points_df.assign(city_lower=city_key(points_df['city']))
+    enriched_df = pd.merge(points_df, addresses_df, on=['city_lower', 'postal_code'], how='left')
+    return enriched_df.drop(columns=['city_lower'])
+
+
+def enrich_by_city_and_street(points_df: pd.DataFrame, addresses_df: pd.DataFrame, id_column: str) -> pd.DataFrame:
+    """
+    Merge the points with the adresy_cr dataset in 2 steps
+    1. on the city only, for cities with one unique city_code
+    2. on the city and street, for cities with multiple city_codes
+    if the street is the same as the city it is not used for the merge
+    """
+    addresses_df = addresses_df[['city_code', 'city', 'street']].drop_duplicates().fillna({'city': '', 'street': ''})
+    addresses_df = addresses_df.assign(city_lower=addresses_df['city'].str.lower(), street_lower=addresses_df['street'].str.lower())
+
+    keys_df = points_df[[id_column, 'city', 'street']].fillna({'city': '', 'street': ''})
+    keys_df = keys_df.assign(city_lower=city_key(keys_df['city']), street_lower=keys_df['street'].str.lower())
+    keys_df.loc[keys_df['street_lower'] == keys_df['city_lower'], 'street_lower'] = ''
+
+    # split the addresses into cities with one unique city_code and cities with multiple city_codes
+    city_code_counts = addresses_df.groupby('city')['city_code'].transform('nunique')
+    unique_city_codes_df = addresses_df.loc[city_code_counts == 1, ['city_code', 'city_lower']].drop_duplicates()
+    multiple_city_codes_df = addresses_df.loc[city_code_counts > 1, ['city_code', 'city_lower', 'street_lower']].drop_duplicates()
+
+    city_merged_df = pd.merge(keys_df[[id_column, 'city_lower']], unique_city_codes_df, on='city_lower', how='inner')
+    street_keys_df = keys_df.loc[keys_df['street_lower'] != '', [id_column, 'city_lower', 'street_lower']]
+    city_street_merged_df = pd.merge(street_keys_df, multiple_city_codes_df, on=['city_lower', 'street_lower'], how='inner')
+
+    city_codes_df = pd.concat(
+        [city_merged_df[[id_column, 'city_code']], city_street_merged_df[[id_column, 'city_code']]],
+        ignore_index=True,
+    ).drop_duplicates()
+
+    # left merge with the points to keep all the rows
+    return pd.merge(points_df, city_codes_df, on=id_column, how='left')
+
+
+# city codes already looked up in the RUIAN web service, by AMD code
+_ruian_city_codes = {}
+
+
+def enrich_by_ruian_code(points_df: pd.DataFrame, addresses_df: Optional[pd.DataFrame], id_column: str) -> pd.DataFrame:
+    """ Look the city_code up by the AMD code (ruian_code); each code is fetched once, the requests are pipelined """
+    ruian_codes = [int(ruian_code) for ruian_code in points_df['ruian_code'].dropna().unique()]
+    missing_codes = [ruian_code for ruian_code in ruian_codes if ruian_code not in _ruian_city_codes]
+    for ruian_code, city_code in get_city_codes_by_ruian_codes(missing_codes, max_workers=RUIAN_MAX_WORKERS):
+        print(f"Found city_code {city_code} for ruian_code {ruian_code}")
+        # failed lookups are not cached so they are tried again next time
+        if city_code is not None:
+            _ruian_city_codes[ruian_code] = city_code
+
+    city_codes = [
+        _ruian_city_codes.get(int(ruian_code)) if pd.notna(ruian_code) else None
+        for ruian_code in points_df['ruian_code']
+    ]
+    return points_df.assign(city_code=pd.array(city_codes, dtype='Int64'))
+
+
+ENRICHERS = {
+    'city_postal_code': enrich_by_city_and_postal_code,
+    'city_street': enrich_by_city_and_street,
+    'ruian_code': enrich_by_ruian_code,
+}
+
+
+def enrich_provider_data(adapter: ProviderAdapter, cleaned_file, adresy_file, output_file: Optional[str]) -> pa.Table:
+    """
+    Enrich the cleaned dataset of the provider (a file or the table handed over from the cleaner) with city_code
+    save it if output_file is given and return the validated table
+    """
+    points_df = read_stage(cleaned_file, adapter.name)
+    addresses_df = load_addresses(adresy_file) if adapter.enrich_strategy != 'ruian_code' else None
+
+    enriched_df = ENRICHERS[adapter.enrich_strategy](points_df, addresses_df, adapter.id_column)
+
+    # Drop duplicates if any
+    enriched_df = enriched_df.drop_duplicates()
+
+    # print number of rows with missing city_code
+    missing_count = int(enriched_df['city_code'].isna().sum())
+    overall_count = len(enriched_df)
+    if overall_count:
+        print(f"Number of rows with missing addresses_df: {missing_count} out of {overall_count}, which is {missing_count/overall_count:.2%}")
+
+    return write_stage(enriched_df, output_file, f"{adapter.name}_enriched")
@@ -0,0 +1,119 @@
+"""
+this module declares the pickup point providers for the shared engine (provider_engine.py)
+to add a new provider (e.g. PPL, DPD or Balíkovna):
+1. declare the schema of its cleaned dataset (in schemas.py or as the adapter's schema)
+2. map the raw columns to the schema columns in field_mapping
+3. if the raw feed needs more than renaming, e.g. an address packed in one field, write a parse hook
+   which works on the whole batch (DataFrame) and returns it with the extra columns
+4. pick the enrich strategy and register the adapter with register_provider
+the engine then reads the feed in batches (see read_raw_batches), splits the addresses and numbers, validates and enriches the data
+"""
+
+import ast
+
+import pandas as pd
+
+from provider_engine import ProviderAdapter, register_schema
+
+PROVIDERS = {}
+
+
+def register_provider(adapter: ProviderAdapter) -> ProviderAdapter:
+    """ Make the provider available to the pipeline """
+    register_schema(adapter)
+    PROVIDERS[adapter.name] = adapter
+    return adapter
+
+
+def parse_zasilkovna(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unpack the address and coordinates fields of zasilkovna
+    1. coordinates "{'latitude': 49.36891, 'longitude': 12.8581}" -> latitude, longitude
+    2. address "{'name': 'Z-BOX Veverská Bítýška, Hvozdecká 134'}" -> city "Veverská Bítýška", street "Hvozdecká", number "134"
+       - "Z-BOX city, street number": the note in brackets after the number is removed,
+         e.g. "Z-BOX Kdyně, Na Kobyle 209 (automyčka Comfort wapka)"
+       - "Z-BOX city number" without a comma: the street is the city, e.g. "Z-BOX Benešov nad Černou 20"
+       - if the address does not end with a number, the number is empty
+    raises ValueError if a field is not in the expected format
+    """
+    df = df.copy()
+
+    coordinates = df['coordinates'].astype('string')
+    df['latitude'] = pd.to_numeric(coordinates.str.extract(r"'latitude':\s*(-?[\d.]+)")[0])
+    df['longitude'] = pd.to_numeric(coordinates.str.extract(r"'longitude':\s*(-?[\d.]+)")[0])
+    if df[['latitude', 'longitude']].isna().any(axis=None):
+        raise ValueError("Coordinates format is not as expected")
+
+    address = df['address'].astype('string')
+    full_address = address.str.extract(r"""'name':\s*['"](.*)['"]\s*}""")[0]
+    # escaped characters (e.g. \\ufeff) need the full Python literal parser
+    escaped = address.str.contains('\\', regex=False).fillna(False)
+    full_address[escaped] = address[escaped].map(lambda value: ast.literal_eval(value).get('name'))
+    if full_address.isna().any():
+        raise ValueError(f"Address {df.loc[full_address.isna(), 'address'].iloc[0]} format is not as expected")
+
+    parts = full_address.str.split(', ', n=2, expand=True).reindex(columns=[0, 1])
+    has_comma = parts[1].notna()
+    first_part = parts[0].str.replace('Z-BOX ', '', regex=False).str.strip()
+
+    # the street part with the number; the note in brackets is only removed when there is a comma
+    street_part = parts[1].str.strip().str.split(' (', n=1, regex=False).str[0].where(has_comma, first_part)
+    street_number = street_part.str.extract(r'^(.*)\s(\S*\d)$')
+    df['street'] = street_number[0].fillna(street_part)
+    df['number'] = street_number[1].fillna('')
+    df['city'] = first_part.where(has_comma, df['street'])
+    return df
+
+
+POSTA = register_provider(ProviderAdapter(
+    name='posta',
+    # every post office has its own postal code; the AMD code is shared by post offices in the same building
+    id_column='postal_code',
+    field_mapping={
+        'NAZ_PROVOZOVNY': 'name',
+        'OBEC': 'city',
+        'PSC': 'postal_code',
+        'NAZ_ULICE': 'street',
+        'CISLO_POP': 'building_number',
+        'CISLO_OR': 'orientation_number',
+        'KOD_RUIAN': 'ruian_code',
+    },
+    read_options={'sep': ';', 'encoding': 'windows-1250', 'skiprows': 1},
+    split_number=False,
+    enrich_strategy='ruian_code',
+))
+
+ALZABOX = register_provider(ProviderAdapter(
+    name='alzabox',
+    id_column='branch_office',
+    field_mapping={
+        'Branch office': 'branch_office',
+        'Název': 'name',
+        'Město': 'city',
+        'PSČ': 'postal_code',
+        'Ulice a číslo': 'address',
+        'GeoX': 'longitude',
+        'GeoY': 'latitude',
+        'První spuštění': 'first_launch',
+        'Otevřen od': 'opened_from',
+        'Otevřen do': 'opened_to',
+    },
+    address_column='address',
+    enrich_strategy='city_postal_code',
+))
+
+ZASILKOVNA = register_provider(ProviderAdapter(
+    name='zasilkovna',
+    id_column='branch_code',
+    field_mapping={
+        'branchCode': 'branch_code',
+        'name': 'name',
+        'city': 'city',
+        'street': 'street',
+        'number': 'building_number',
+        'longitude': 'longitude',
+        'latitude': 'latitude',
+    },
+    parse=parse_zasilkovna,
+    enrich_strategy='city_street',
+))
@@ -0,0 +1,163 @@
+"""
+this script is used to measure the throughput of the AMD -> kod_obce lookup without hitting the real RUIAN service
+1. record the AMD detail pages once (data/raw/ruian_pages/<ruian_code>.html) from the real service,
+   or generate representative pages offline from the known codes in posta_enriched.csv
+2. serve the pages from a local stub server (HTTP/1.1, so that connections can be kept alive)
+3. compare the original sequential fetch + BeautifulSoup parse with the streaming fetch,
+   first with one worker (the effect of streaming alone) and then with several workers (streaming and concurrency)
+the stub server is local, so the requests are not rate limited during the benchmark
+usage:
+    python data_cleaning/ruian_benchmark.py record     # download pages for the codes in posta_cleaned.csv
+    python data_cleaning/ruian_benchmark.py generate   # generate pages without network access
+    python data_cleaning/ruian_benchmark.py            # run the benchmark, pages are generated if there are none
+"""
+
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pandas as pd
+import requests
+from ruian_client import (
+    API_AMD_TO_KOD_OBCE_URL_TEMPLATE,
+    HEADERS,
+    get_city_codes_by_ruian_codes,
+    parse_city_code_from_html,
+)
+
+PAGES_DIR = "data/raw/ruian_pages/"
+POSTA_FILE = "data/clean/posta_cleaned.csv"
+POSTA_ENRICHED_FILE = "data/clean/posta_enriched.csv"
+# artificial latency of the stub server, roughly what the real service takes to respond
+STUB_LATENCY = 0.05
+
+
+def record_pages(ruian_codes, pages_dir=PAGES_DIR):
+    """ Download the AMD detail pages and store them for the stub server """
+    os.makedirs(pages_dir, exist_ok=True)
+    for ruian_code in ruian_codes:
+        page_path = os.path.join(pages_dir, f"{ruian_code}.html")
+        if os.path.exists(page_path):
+            continue
+        response = requests.get(API_AMD_TO_KOD_OBCE_URL_TEMPLATE.format(ruian_code), timeout=10, headers=HEADERS)
+        response.raise_for_status()
+        with open(page_path, "wb") as f:
+            f.write(response.content)
+        print(f"Recorded page for AMD {ruian_code}")
+        time.sleep(1)  # Be respectful to the API
+
+
+def generate_page(ruian_code, city_code):
+    """
+    Build a page shaped like the real AMD detail page: a long head with styles and scripts, the navigation
+    (with links to the municipality search, which have no code), the detail table with the municipality link
+    and a long footer with the map scripts; about 70 kB, the municipality link at about a third of it
+    """
+    head = "".join(f".vdp-class-{i} {{ margin: {i % 7}px; padding: {i % 5}px; }}\n" for i in range(400))
+    navigation = "".join(
+        f'<li><a href="/vdp/ruian/{section}/vyhledej">{section}</a></li>\n'
+        for section in ["obce", "castiobci", "ulice", "stavebniobjekty", "adresnimista"] * 20
+    )
+    details = (
+        f'<tr><th>Kód ADM</th><td>{ruian_code}</td></tr>\n'
+        f'<tr><th>Obec</th><td><a href="/vdp/ruian/obce/{city_code}">Obec {city_code}</a></td></tr>\n'
+        f'<tr><th>Část obce</th><td><a href="/vdp/ruian/castiobci/{city_code}1">Část obce</a></td></tr>\n'
+    )
+    footer = "".join(f"<script>var mapLayer{i} = {{id: {i}, visible: {str(i % 2 == 0).lower()}}};</script>\n" for i in range(700))
+    return (
+        f"<!DOCTYPE html><html><head><style>\n{head}</style></head><body>\n"
+        f"<ul class=\"menu\">\n{navigation}</ul>\n<table class=\"detail\">\n{details}</table>\n{footer}</body></html>\n"
+    ).encode("utf-8")
+
+
+def generate_pages(posta_enriched_file=POSTA_ENRICHED_FILE, pages_dir=PAGES_DIR, count=200):
+    """ Generate pages for the post offices with a known city_code, so the benchmark runs without network access """
+    posta_df = pd.read_csv(posta_enriched_file).dropna(subset=['ruian_code', 'city_code']).head(count)
+    os.makedirs(pages_dir, exist_ok=True)
+    for ruian_code, city_code in zip(posta_df['ruian_code'].astype(int), posta_df['city_code'].astype(int)):
+        with open(os.path.join(pages_dir, f"{ruian_code}.html"), "wb") as f:
+            f.write(generate_page(ruian_code, city_code))
+    print(f"Generated {len(posta_df)} pages in {pages_dir}")
+
+
+def start_stub_server(pages_dir=PAGES_DIR, latency=STUB_LATENCY):
+    """ Serve the recorded pages under /vdp/ruian/adresnimista/<ruian_code>, returns the server and its url template """
+
+    class RecordedPageHandler(BaseHTTPRequestHandler):
+        # keep the connections alive like the real service does, HTTP/1.0 would close them after every page
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            ruian_code = self.path.rstrip('/').rsplit('/', 1)[-1]
+            page_path = os.path.join(pages_dir, f"{ruian_code}.html")
+            time.sleep(latency)
+            if not os.path.exists(page_path):
+                self.send_error(404)
+                return
+            with open(page_path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordedPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url_template = f"http://127.0.0.1:{server.server_port}/vdp/ruian/adresnimista/{{}}"
+    return server, url_template
+
+
+def fetch_sequential(ruian_codes, url_template):
+    """ The original approach: download the whole page, then build the DOM to find the link """
+    city_codes = []
+    for ruian_code in ruian_codes:
+        response = requests.get(url_template.format(ruian_code), timeout=10, headers=HEADERS)
+        response.raise_for_status()
+        city_codes.append(parse_city_code_from_html(response.text))
+    return city_codes
+
+
+def fetch_streaming(ruian_codes, url_template, max_workers=4):
+    city_codes = get_city_codes_by_ruian_codes(ruian_codes, max_workers=max_workers, url_template=url_template, requests_per_second=None)
+    return [city_code for _, city_code in city_codes]
+
+
+def run_benchmark(pages_dir=PAGES_DIR):
+    if not os.path.isdir(pages_dir) or not any(name.endswith(".html") for name in os.listdir(pages_dir)):
+        print(f"No pages found in {pages_dir}, generating them")
+        generate_pages(pages_dir=pages_dir)
+    ruian_codes = [name[:-len(".html")] for name in sorted(os.listdir(pages_dir)) if name.endswith(".html")]
+
+    server, url_template = start_stub_server(pages_dir)
+    try:
+        results = {}
+        for label, fetch in [
+            ("sequential + BeautifulSoup", fetch_sequential),
+            ("streaming, 1 worker", lambda codes, template: fetch_streaming(codes, template, max_workers=1)),
+            ("streaming, 4 workers", lambda codes, template: fetch_streaming(codes, template, max_workers=4)),
+        ]:
+            start = time.perf_counter()
+            results[label] = fetch(ruian_codes, url_template)
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {len(ruian_codes)} pages in {elapsed:.2f} s, {len(ruian_codes)/elapsed:.1f} pages/s")
+        # all the approaches have to find the same codes
+        if len(set(map(tuple, results.values()))) != 1:
+            print("Warning: the approaches returned different city codes")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "record":
+        posta_df = pd.read_csv(POSTA_FILE)
+        record_pages(posta_df['ruian_code'].dropna().astype(int).head(200))
+    elif len(sys.argv) > 1 and sys.argv[1] == "generate":
+        generate_pages()
+    else:
+        run_benchmark()
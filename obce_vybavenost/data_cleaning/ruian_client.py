@@ -4,6 +4,8 @@ import urllib.parse
 import time
 from bs4 import BeautifulSoup
 import re  # Import the regular expression module
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 INPUT_EXCEL_FILE = 'data/alzaboxes_cz.xlsx'  # Replace with your input file name
@@ -27,6 +29,21 @@ HEADERS = {
     'X-Requested-With': 'XMLHttpRequest'  # Often sent by AJAX requests in browsers
 }
 
+# the AMD detail page links to its municipality as /vdp/ruian/obce/<kod_obce>;
+# compiled once and matched against raw bytes so the page never has to be decoded
+OBEC_HREF_PATTERN = re.compile(rb'href="[^"]*?/vdp/ruian/obce/(\d+)')
+OBEC_HREF_FALLBACK_PATTERN = re.compile(r"/vdp/ruian/obce/(\d+)")
+# bytes carried over between streamed chunks so a link split across two chunks is still found
+STREAM_CHUNK_SIZE = 8192
+STREAM_OVERLAP = 512
+
+# at most this many requests per second are sent to the RUIAN service, by all the threads together
+MAX_REQUESTS_PER_SECOND = 1.0
+
+_thread_local = threading.local()
+_rate_limit_lock = threading.Lock()
+_next_request_time = 0.0
+
 
 def get_address_alternatives(address_detail, city):
     full = f"{address_detail} {city}"
@@ -69,32 +86,115 @@ def get_address_code(address_detail, city):
     return None, None, None
 
 
-def get_city_code_by_ruian_code(ruian_code):
+def _get_session():
+    """Return a requests session bound to the current thread, so its connections are reused between requests."""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        _thread_local.session = session
+    return session
+
+
+def extract_city_code_from_stream(chunks):
+    """
+    Scan an iterable of byte chunks for the first municipality link and return its kod_obce.
+    Stops consuming the chunks as soon as a complete match is found.
+    Returns (city_code, body) where body holds the bytes read so far; city_code is None if no link was found.
+    """
+    received = []
+    tail = b''
+    window = b''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        received.append(chunk)
+        window = tail + chunk
+        match = OBEC_HREF_PATTERN.search(window)
+        # a match ending exactly at the window end may still continue with more digits in the next chunk
+        if match and match.end() < len(window):
+            return int(match.group(1)), b''.join(received)
+        tail = window[-STREAM_OVERLAP:]
+    # the page may end right after the digits
+    match = OBEC_HREF_PATTERN.search(window)
+    if match:
+        return int(match.group(1)), b''.join(received)
+    return None, b''.join(received)
+
+
+def parse_city_code_from_html(html):
+    """Fallback: find the municipality link with a full HTML parser and return its kod_obce."""
+    soup = BeautifulSoup(html, 'html.parser')
+    obec_href = soup.find('a', href=OBEC_HREF_FALLBACK_PATTERN).get('href')
+    matched_id = OBEC_HREF_FALLBACK_PATTERN.search(obec_href)
+    return int(matched_id.group(1))
+
+
+def get_city_code_by_ruian_code(ruian_code, url_template=API_AMD_TO_KOD_OBCE_URL_TEMPLATE):
     if not ruian_code:
         return None
 
-    url = API_AMD_TO_KOD_OBCE_URL_TEMPLATE.format(ruian_code)
+    url = url_template.format(ruian_code)
     print(f"Fetching kod_obce for AMD: {ruian_code} (URL: {url})")
 
     try:
-        response = requests.get(url, timeout=10, headers=HEADERS)
-        response.raise_for_status()
-
-        try:
-          target_href_pattern = re.compile(r"/vdp/ruian/obce/")
-          soup = BeautifulSoup(response.text, 'html.parser')
-          obec_href = soup.find('a', href=target_href_pattern).get('href')
-          matched_id = re.search(r"/vdp/ruian/obce/(\d+)", obec_href)
-
-          return int(matched_id.group(1))
-        except Exception as e:
-            print(f"ParseError for AMD {ruian_code}: {e}")
-            return None
+        with _get_session().get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            # scan the page as it arrives and stop looking at the first municipality link, no DOM is built
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            city_code, body = extract_city_code_from_stream(chunks)
+            if city_code is not None:
+                # read the rest of the (small) page, otherwise the connection is closed instead of being reused
+                for _ in chunks:
+                    pass
+                return city_code
+
+            try:
+                # the fast path did not find the link, parse the whole page properly
+                html = body.decode(response.encoding or 'utf-8', errors='replace')
+                return parse_city_code_from_html(html)
+            except Exception as e:
+                print(f"ParseError for AMD {ruian_code}: {e}")
+                return None
     except requests.exceptions.RequestException as e:
         print(f"Error fetching kod_obce for AMD {ruian_code}: {e}")
         return None
 
 
+def _wait_for_request_slot(requests_per_second):
+    """Block until the next request may be sent, so that all threads together stay under the rate limit."""
+    global _next_request_time
+    with _rate_limit_lock:
+        now = time.monotonic()
+        request_time = max(now, _next_request_time)
+        _next_request_time = request_time + 1 / requests_per_second
+    time.sleep(request_time - now)
+
+
+def _get_city_code_rate_limited(ruian_code, url_template, requests_per_second):
+    if ruian_code and requests_per_second:
+        _wait_for_request_slot(requests_per_second)
+    return get_city_code_by_ruian_code(ruian_code, url_template)
+
+
+def get_city_codes_by_ruian_codes(ruian_codes, max_workers=4, url_template=API_AMD_TO_KOD_OBCE_URL_TEMPLATE,
+                                  requests_per_second=MAX_REQUESTS_PER_SECOND):
+    """
+    Fetch kod_obce for many AMD codes with several requests in flight at once,
+    so that waiting for one page overlaps with extracting the code from another.
+    The requests are started at most requests_per_second per second (shared by all callers); None disables the limit,
+    e.g. for a local stub server.
+    Yields (ruian_code, city_code) pairs in the input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (ruian_code, executor.submit(_get_city_code_rate_limited, ruian_code, url_template, requests_per_second))
+            for ruian_code in ruian_codes
+        ]
+        for ruian_code, future in futures:
+            yield ruian_code, future.result()
+
+
 def match_address_to_city_code():
     print(f"Starting script. Reading input file: {INPUT_EXCEL_FILE}")
     try:
@@ -0,0 +1,196 @@
+"""
+this module declares the schema (column names and types) of every dataset passed between the pipeline stages
+and converts the data to and from Arrow tables which follow the schema
+1. codes (ruian_code, city_code, ...) are integers, not floats; e.g. "539767.0" -> 539767
+2. postal_code is always a string; e.g. 25267 -> "25267"
+3. building and orientation numbers are strings because they may contain letters; e.g. "421.0" -> "421", "2a"
+4. coordinates are floats
+5. dates are dates, without time; e.g. "2020-09-24"
+when the stages run in one process the Arrow table is handed over directly without any serialization,
+otherwise it is stored either as CSV or as an Arrow IPC file (.arrow) which is memory mapped when read
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+POSTA_SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('city', pa.string()),
+    ('postal_code', pa.string()),
+    ('street', pa.string()),
+    ('building_number', pa.string()),
+    ('orientation_number', pa.string()),
+    ('ruian_code', pa.int64()),
+])
+
+ALZABOX_SCHEMA = pa.schema([
+    ('branch_office', pa.string()),
+    ('name', pa.string()),
+    ('city', pa.string()),
+    ('postal_code', pa.string()),
+    ('street', pa.string()),
+    ('building_number', pa.string()),
+    ('orientation_number', pa.string()),
+    ('longitude', pa.float64()),
+    ('latitude', pa.float64()),
+    ('first_launch', pa.date32()),
+    ('opened_from', pa.string()),
+    ('opened_to', pa.string()),
+])
+
+ZASILKOVNA_SCHEMA = pa.schema([
+    ('branch_code', pa.string()),
+    ('name', pa.string()),
+    ('city', pa.string()),
+    ('street', pa.string()),
+    ('building_number', pa.string()),
+    ('orientation_number', pa.string()),
+    ('longitude', pa.float64()),
+    ('latitude', pa.float64()),
+])
+
+ADDRESSES_SCHEMA = pa.schema([
+    ('adm_code', pa.int64()),
+    ('city_code', pa.int64()),
+    ('city', pa.string()),
+    ('city_part', pa.string()),
+    ('city_part_code', pa.int64()),
+    ('street', pa.string()),
+    ('building_number', pa.string()),
+    ('orientation_number', pa.string()),
+    ('postal_code', pa.string()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('valid_from', pa.string()),
+])
+
+CITY_CODE_FIELD = pa.field('city_code', pa.int64())
+
+SCHEMAS = {
+    'posta': POSTA_SCHEMA,
+    'alzabox': ALZABOX_SCHEMA,
+    'zasilkovna': ZASILKOVNA_SCHEMA,
+    'addresses': ADDRESSES_SCHEMA,
+    # the enriched datasets only add the city_code column
+    'posta_enriched': POSTA_SCHEMA.append(CITY_CODE_FIELD),
+    'alzabox_enriched': ALZABOX_SCHEMA.append(CITY_CODE_FIELD),
+    'zasilkovna_enriched': ZASILKOVNA_SCHEMA.append(CITY_CODE_FIELD),
+}
+
+
+def get_schema(dataset: str, columns: list = None) -> pa.Schema:
+    """ Return the schema of the dataset, optionally only with the given columns """
+    if dataset not in SCHEMAS:
+        raise ValueError(f"Unknown dataset {dataset}, expected one of {list(SCHEMAS)}")
+    schema = SCHEMAS[dataset]
+    if columns is not None:
+        schema = pa.schema([schema.field(column) for column in columns])
+    return schema
+
+
+def _to_text(series: pd.Series) -> pd.Series:
+    """
+    Cast to string; whole numbers written as floats lose the ".0" suffix; e.g. 421.0 -> "421"
+    empty strings are missing values, the same as after a round trip through CSV
+    """
+    series = series.astype('string').str.strip()
+    series = series.str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+    return series.mask(series == '')
+
+
+def conform(data, dataset: str, columns: list = None) -> pa.Table:
+    """
+    Validate the data (pandas DataFrame or Arrow table) against the schema of the dataset
+    and return it as an Arrow table with exactly the schema columns in the schema order
+    raises ValueError if a column is missing or a value cannot be converted to the declared type
+    """
+    schema = get_schema(dataset, columns)
+
+    if isinstance(data, pd.DataFrame) and all(
+        name in data.columns and isinstance(data[name].dtype, pd.ArrowDtype) for name in schema.names
+    ):
+        # Arrow backed columns are handed over without copying
+        data = pa.Table.from_pandas(data[schema.names], preserve_index=False)
+
+    if isinstance(data, pa.Table):
+        missing_columns = [name for name in schema.names if name not in data.column_names]
+        if missing_columns:
+            raise ValueError(f"Dataset {dataset} is missing columns {missing_columns}")
+        table = data.select(schema.names)
+        if table.schema.equals(schema):
+            # already follows the contract, nothing to convert
+            return table
+        data = table.to_pandas()
+
+    missing_columns = [name for name in schema.names if name not in data.columns]
+    if missing_columns:
+        raise ValueError(f"Dataset {dataset} is missing columns {missing_columns}")
+
+    columns_data = {}
+    for field in schema:
+        series = data[field.name]
+        try:
+            if pa.types.is_string(field.type):
+                series = _to_text(series)
+            elif pa.types.is_integer(field.type):
+                series = pd.to_numeric(series, errors='raise')
+                if pd.api.types.is_float_dtype(series.dtype) and (series.dropna() != series.dropna().round()).any():
+                    raise ValueError("values are not whole numbers")
+                series = series.astype('Int64')
+            elif pa.types.is_date(field.type):
+                series = pd.to_datetime(series, errors='raise').dt.date
+            else:
+                series = pd.to_numeric(series, errors='raise').astype('Float64')
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Column {field.name} of dataset {dataset} does not match type {field.type}: {e}")
+        columns_data[field.name] = pa.array(series, type=field.type, from_pandas=True)
+
+    return pa.Table.from_pydict(columns_data, schema=schema)
+
+
+def to_dataframe(table: pa.Table) -> pd.DataFrame:
+    """ Arrow backed DataFrame; the columns share the memory of the table instead of being copied """
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def read_stage(source, dataset: str, columns: list = None) -> pd.DataFrame:
+    """
+    Read the output of a previous stage as a DataFrame following the schema of the dataset
+    source is either the data handed over in process (DataFrame or Arrow table)
+    or a path to a CSV or Arrow IPC (.arrow) file
+    """
+    if isinstance(source, (pa.Table, pd.DataFrame)):
+        table = source
+    elif str(source).endswith('.arrow'):
+        # memory mapped, the data is not copied or parsed
+        table = feather.read_table(source, columns=columns, memory_map=True)
+    else:
+        schema = get_schema(dataset, columns)
+        table = pa_csv.read_csv(
+            source,
+            convert_options=pa_csv.ConvertOptions(
+                # read everything as declared, except the floats written for integer codes by older runs
+                column_types={field.name: field.type for field in schema if not pa.types.is_integer(field.type)},
+                include_columns=columns,
+                strings_can_be_null=True,
+            ),
+        )
+    return to_dataframe(conform(table, dataset, columns))
+
+
+def write_stage(data, path: str, dataset: str) -> pa.Table:
+    """
+    Validate the data against the schema and save it as CSV or Arrow IPC (.arrow)
+    if path is None the data is only validated, e.g. when it is handed over to the next stage in process
+    returns the validated table
+    """
+    table = conform(data, dataset)
+    if path is None:
+        return table
+    if str(path).endswith('.arrow'):
+        feather.write_feather(table, path, compression='uncompressed')
+    else:
+        to_dataframe(table).to_csv(path, index=False)
+    return table
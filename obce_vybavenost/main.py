@@ -1,6 +1,62 @@
-def main():
-    print("Hello from obce-vybavenost!")
+"""
+command line queries over the enriched pickup point datasets, see query.py
+usage:
+    python main.py points --city-code 555134 [--provider alzabox]
+    python main.py points --postal-code 53002
+    python main.py without [--provider posta]
+    python main.py coverage [--city-code 555134]
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+
+from query import DATA_DIRECTORY, PROVIDER_DATASETS, PickupPointQueries
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Query the enriched pickup point datasets")
+    parser.add_argument('--data-directory', default=DATA_DIRECTORY, help="directory with the enriched datasets")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    points_parser = subparsers.add_parser('points', help="pickup points by city_code or postal code")
+    location = points_parser.add_mutually_exclusive_group(required=True)
+    location.add_argument('--city-code', type=int)
+    location.add_argument('--postal-code')
+    points_parser.add_argument('--provider', choices=list(PROVIDER_DATASETS))
+
+    without_parser = subparsers.add_parser('without', help="municipalities without a pickup point of the provider")
+    without_parser.add_argument('--provider', choices=list(PROVIDER_DATASETS), default='posta')
+
+    coverage_parser = subparsers.add_parser('coverage', help="number of pickup points per municipality")
+    coverage_parser.add_argument('--city-code', type=int)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        queries = PickupPointQueries(args.data_directory)
+
+        if args.command == 'points':
+            if args.city_code is not None:
+                result = queries.points_by_city_code(args.city_code, args.provider)
+            else:
+                result = queries.points_by_postal_code(args.postal_code, args.provider)
+        elif args.command == 'without':
+            result = queries.municipalities_without(args.provider)
+        else:
+            result = queries.coverage(args.city_code)
+    except FileNotFoundError as e:
+        # e.g. the posta dataset is only enriched with pipeline.py --posta, adresy_cr is not in the repository
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+        print(result.to_string(index=False))
+    print(f"{len(result)} rows")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
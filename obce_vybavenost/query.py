@@ -0,0 +1,245 @@
+"""
+this module answers simple questions over the enriched pickup point datasets without reloading the files, e.g.
+- which pickup points serve city_code X
+- which pickup points are in postal code X
+- which municipalities have no post office
+- how many points and distinct locations each municipality has
+the enriched files (data/clean/*_enriched.csv or .arrow) are loaded once into an in-memory DuckDB database
+with indexes on city_code and postal_code; pickup_points is a view over all providers
+the results are kept in an LRU cache; before every query the files are checked (modification time and size)
+and a changed file is loaded again and the cache is cleared
+the colocation output is only used while it is newer than all the enriched datasets it was built from
+"""
+
+import os
+from collections import OrderedDict
+
+import duckdb
+import pandas as pd
+import pyarrow.feather as feather
+
+DATA_DIRECTORY = "data/clean/"
+
+# provider -> name of its enriched dataset
+PROVIDER_DATASETS = {
+    'posta': "posta_enriched",
+    'alzabox': "alzaboxes_enriched",
+    'zasilkovna': "zasilkovna_enriched",
+}
+# output of data_cleaning/colocation.py, optional
+COLOCATION_DATASET = "colocated_points"
+# the list of municipalities comes from the adresy_cr dataset, optional
+ADDRESSES_DATASET = "adresy_cr/combined_addresses_cz_cleaned"
+
+# columns shared by all providers in the pickup_points view
+POINT_COLUMNS = ['provider', 'point_id', 'name', 'city_code', 'city', 'postal_code', 'street', 'building_number', 'orientation_number', 'longitude', 'latitude']
+# the same ids as in the colocation output; the AMD code (ruian_code) of posta is shared by several post offices
+POINT_ID_COLUMNS = {'posta': 'postal_code', 'alzabox': 'branch_office', 'zasilkovna': 'branch_code'}
+
+CACHE_SIZE = 256
+
+
+def find_dataset_file(data_directory: str, dataset: str):
+    """
+    Return the path of the dataset, the newer of the Arrow IPC file and the CSV if both exist
+    (e.g. an old .arrow output next to a CSV from a later run); None if there is neither
+    """
+    paths = [os.path.join(data_directory, dataset + extension) for extension in ['.arrow', '.csv']]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        return None
+    return max(paths, key=lambda path: os.stat(path).st_mtime_ns)
+
+
+def text_sql(column: str) -> str:
+    """ SQL casting the column to text; whole numbers written as floats by older runs lose the ".0"; e.g. "421.0" -> "421" """
+    return f"regexp_replace(CAST({column} AS VARCHAR), '^(\\d+)\\.0$', '\\1')"
+
+
+def file_signature(path: str):
+    """ Modification time and size, changes whenever the file is rewritten """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PickupPointQueries:
+    """ Query API over the enriched datasets with an in-process result cache """
+
+    def __init__(self, data_directory: str = DATA_DIRECTORY, cache_size: int = CACHE_SIZE, use_colocation: bool = True):
+        self.data_directory = data_directory
+        self.cache_size = cache_size
+        # without the colocation output coverage() has no location_count
+        self.use_colocation = use_colocation
+        self.connection = duckdb.connect()
+        # table name -> (path, signature) of the loaded file
+        self._loaded = {}
+        # (path, signature) of a colocation output already reported as stale
+        self._stale_colocation = None
+        self._cache = OrderedDict()
+        self._refresh()
+
+    # --- loading ---
+
+    def _load_table(self, table: str, path: str, select_sql: str, index_columns: list):
+        """ (Re)create the table from the file and index it """
+        if path.endswith('.arrow'):
+            self.connection.register('arrow_source', feather.read_table(path, memory_map=True))
+            from_sql, params = "arrow_source", []
+        else:
+            # everything is read as text and cast explicitly, older outputs have codes written as floats
+            from_sql, params = "read_csv(?, header=true, all_varchar=true)", [path]
+        self.connection.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT {select_sql} FROM {from_sql}", params)
+        if path.endswith('.arrow'):
+            self.connection.unregister('arrow_source')
+        for column in index_columns:
+            self.connection.execute(f"CREATE INDEX {table}_{column}_idx ON {table} ({column})")
+
+    def _point_select_sql(self, provider: str, path: str) -> str:
+        """ Select the shared columns of the provider with the same types for all providers """
+        if path.endswith('.arrow'):
+            columns = feather.read_table(path, memory_map=True).schema.names
+        else:
+            columns = self.connection.execute("SELECT * FROM read_csv(?, header=true, all_varchar=true) LIMIT 0", [path]).fetchdf().columns
+        expressions = {
+            'provider': f"'{provider}'",
+            'point_id': text_sql(POINT_ID_COLUMNS[provider]),
+            'city_code': "CAST(TRY_CAST(city_code AS DOUBLE) AS BIGINT)",
+            'longitude': "TRY_CAST(longitude AS DOUBLE)",
+            'latitude': "TRY_CAST(latitude AS DOUBLE)",
+        }
+        select = []
+        for column in POINT_COLUMNS:
+            if column in expressions and (column in columns or column in ['provider', 'point_id']):
+                select.append(f"{expressions[column]} AS {column}")
+            elif column in columns:
+                select.append(f"{text_sql(column)} AS {column}")
+            else:
+                # e.g. posta has no coordinates, zasilkovna has no postal code
+                column_type = 'DOUBLE' if column in ['longitude', 'latitude'] else 'VARCHAR'
+                select.append(f"CAST(NULL AS {column_type}) AS {column}")
+        return ', '.join(select)
+
+    def _refresh(self):
+        """ Load the files which are new or changed since they were loaded; clears the cache if anything changed """
+        changed = False
+
+        for provider, dataset in PROVIDER_DATASETS.items():
+            path = find_dataset_file(self.data_directory, dataset)
+            if path is None:
+                raise FileNotFoundError(f"Enriched dataset {dataset} not found in {self.data_directory}, run data_cleaning/pipeline.py first (posta only with --posta)")
+            if self._loaded.get(provider) != (path, file_signature(path)):
+                self._load_table(provider, path, self._point_select_sql(provider, path), ['city_code', 'postal_code'])
+                self._loaded[provider] = (path, file_signature(path))
+                changed = True
+
+        colocation_path = find_dataset_file(self.data_directory, COLOCATION_DATASET) if self.use_colocation else None
+        if colocation_path is not None and self._is_stale(colocation_path):
+            if self._stale_colocation != (colocation_path, file_signature(colocation_path)):
+                print(f"Ignoring {colocation_path}, it is older than the enriched datasets, run data_cleaning/colocation.py again")
+                self._stale_colocation = (colocation_path, file_signature(colocation_path))
+            colocation_path = None
+        if colocation_path is not None and self._loaded.get('colocation') != (colocation_path, file_signature(colocation_path)):
+            self._load_table(
+                'colocation', colocation_path,
+                f"provider, {text_sql('point_id')} AS point_id, CAST(TRY_CAST(city_code AS DOUBLE) AS BIGINT) AS city_code, "
+                f"CAST(cluster_id AS BIGINT) AS cluster_id",
+                [],
+            )
+            self._loaded['colocation'] = (colocation_path, file_signature(colocation_path))
+            changed = True
+        elif colocation_path is None and 'colocation' in self._loaded:
+            # the colocation output was removed or is out of date
+            self.connection.execute("DROP TABLE colocation")
+            del self._loaded['colocation']
+            changed = True
+
+        if changed:
+            providers_sql = " UNION ALL ".join(f"SELECT * FROM {provider}" for provider in PROVIDER_DATASETS)
+            self.connection.execute(f"CREATE OR REPLACE VIEW pickup_points AS {providers_sql}")
+            self._cache.clear()
+
+    def _is_stale(self, path: str) -> bool:
+        """ True if the file is older than any of the loaded enriched datasets, i.e. it was built from older data """
+        return any(file_signature(path)[0] < file_signature(self._loaded[provider][0])[0] for provider in PROVIDER_DATASETS)
+
+    def _load_municipalities(self):
+        """ Distinct municipalities from the adresy_cr dataset, loaded on first use """
+        path = find_dataset_file(self.data_directory, ADDRESSES_DATASET)
+        if path is None:
+            raise FileNotFoundError(f"Addresses dataset {ADDRESSES_DATASET} not found in {self.data_directory}, run data_cleaning/address_cleaner.py first")
+        if self._loaded.get('municipalities') != (path, file_signature(path)):
+            self._load_table(
+                'municipalities', path,
+                "DISTINCT CAST(TRY_CAST(city_code AS DOUBLE) AS BIGINT) AS city_code, CAST(city AS VARCHAR) AS city",
+                ['city_code'],
+            )
+            self._loaded['municipalities'] = (path, file_signature(path))
+            self._cache.clear()
+
+    # --- querying ---
+
+    def query(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """ Run the SQL and return the result as a DataFrame; repeated queries are answered from the cache """
+        self._refresh()
+        key = (sql, params)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = self.connection.execute(sql, list(params)).fetchdf()
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        # a copy, so that the caller cannot change the cached result
+        return self._cache[key].copy()
+
+    def points_by_city_code(self, city_code: int, provider: str = None) -> pd.DataFrame:
+        """ Pickup points serving the municipality, optionally of one provider only """
+        if provider is None:
+            return self.query("SELECT * FROM pickup_points WHERE city_code = ? ORDER BY provider, point_id", (int(city_code),))
+        self._check_provider(provider)
+        return self.query(f"SELECT * FROM {provider} WHERE city_code = ? ORDER BY point_id", (int(city_code),))
+
+    def points_by_postal_code(self, postal_code, provider: str = None) -> pd.DataFrame:
+        """ Pickup points with the postal code (zasilkovna has no postal code); "530 02" and 53002 are the same """
+        postal_code = str(postal_code).replace(' ', '')
+        if provider is None:
+            return self.query("SELECT * FROM pickup_points WHERE postal_code = ? ORDER BY provider, point_id", (postal_code,))
+        self._check_provider(provider)
+        return self.query(f"SELECT * FROM {provider} WHERE postal_code = ? ORDER BY point_id", (postal_code,))
+
+    def municipalities_without(self, provider: str = 'posta') -> pd.DataFrame:
+        """ Municipalities with no pickup point of the provider, e.g. municipalities with no post office """
+        self._check_provider(provider)
+        self._load_municipalities()
+        return self.query(
+            f"SELECT city_code, city FROM municipalities m "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {provider} p WHERE p.city_code = m.city_code) ORDER BY city, city_code"
+        )
+
+    def coverage(self, city_code: int = None) -> pd.DataFrame:
+        """
+        Number of pickup points per municipality and provider
+        if the colocation output exists, also the number of distinct locations of all the providers together
+        the locations are counted over the colocation output on its own, so the point counts
+        are the same with and without it
+        """
+        counts_sql = ", ".join(f"count(*) FILTER (WHERE provider = '{provider}') AS {provider}_count" for provider in PROVIDER_DATASETS)
+        where_sql, params = ("WHERE city_code = ?", (int(city_code),)) if city_code is not None else ("WHERE city_code IS NOT NULL", ())
+        points_sql = (
+            f"SELECT city_code, any_value(city) AS city, count(*) AS point_count, {counts_sql} "
+            f"FROM pickup_points {where_sql} GROUP BY city_code"
+        )
+        # the SQL depends on whether the colocation output exists now
+        self._refresh()
+        if 'colocation' not in self._loaded:
+            return self.query(f"{points_sql} ORDER BY point_count DESC, city_code", params)
+        return self.query(
+            f"WITH points AS ({points_sql}), "
+            f"locations AS (SELECT city_code, count(DISTINCT cluster_id) AS location_count FROM colocation GROUP BY city_code) "
+            f"SELECT points.*, locations.location_count FROM points LEFT JOIN locations USING (city_code) "
+            f"ORDER BY point_count DESC, city_code",
+            params,
+        )
+
+    def _check_provider(self, provider: str):
+        if provider not in PROVIDER_DATASETS:
+            raise ValueError(f"Unknown provider {provider}, expected one of {list(PROVIDER_DATASETS)}")
@@ -0,0 +1,122 @@
+"""
+tests of the query API (query.py) over small enriched datasets written to a temporary directory
+run from the obce_vybavenost directory:
+    python -m unittest discover -s tests
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query import PickupPointQueries, find_dataset_file  # noqa: E402
+
+# three post offices in one building share the AMD code, one has none
+POSTA_DF = pd.DataFrame({
+    'name': ['Opava 1', 'Opava 2', 'Opava 3', 'Opava 4', 'Brno 2'],
+    'city': ['Opava', 'Opava', 'Opava', 'Opava', 'Brno'],
+    'postal_code': ['74601', '74602', '74603', '74604', '60200'],
+    'street': ['Horní náměstí', 'Horní náměstí', 'Horní náměstí', 'Krnovská', 'Orlí'],
+    'building_number': ['55', '55', '55', '10', '30'],
+    'orientation_number': [None, None, None, None, None],
+    'ruian_code': [24370428, 24370428, 24370428, None, 19093667],
+    'city_code': [505927, 505927, 505927, 505927, 582786],
+})
+ALZABOX_DF = pd.DataFrame({
+    'branch_office': ['AB1', 'AB2'],
+    'name': ['Alzabox Opava', 'Alzabox Brno'],
+    'city': ['Opava', 'Brno'],
+    'postal_code': ['74601', '60200'],
+    'street': ['Horní náměstí', 'Orlí'],
+    'building_number': ['55', '30'],
+    'orientation_number': [None, None],
+    'longitude': [17.9, 16.6],
+    'latitude': [49.94, 49.19],
+    'city_code': [505927, 582786],
+})
+ZASILKOVNA_DF = pd.DataFrame({
+    'branch_code': ['z-box-opava'],
+    'name': ['Z-BOX'],
+    'city': ['Opava'],
+    'street': ['Krnovská'],
+    'building_number': ['10'],
+    'orientation_number': [None],
+    'longitude': [17.89],
+    'latitude': [49.93],
+    'city_code': [505927],
+})
+# Horní náměstí 55 (3 post offices and the Alzabox), Krnovská 10 (post office and Z-BOX), Orlí 30 in Brno
+COLOCATION_DF = pd.DataFrame({
+    'provider': ['posta'] * 5 + ['alzabox', 'alzabox', 'zasilkovna'],
+    'point_id': ['74601', '74602', '74603', '74604', '60200', 'AB1', 'AB2', 'z-box-opava'],
+    'city_code': [505927, 505927, 505927, 505927, 582786, 505927, 582786, 505927],
+    'cluster_id': [0, 0, 0, 1, 2, 0, 2, 1],
+})
+
+
+class QueryTest(unittest.TestCase):
+
+    def setUp(self):
+        # the quote checks that the paths are not pasted into the SQL
+        self.directory = tempfile.TemporaryDirectory(suffix="o'clock")
+        self.data_directory = self.directory.name
+        for dataset, df in [('posta_enriched', POSTA_DF), ('alzaboxes_enriched', ALZABOX_DF), ('zasilkovna_enriched', ZASILKOVNA_DF)]:
+            df.to_csv(self.path(dataset + '.csv'), index=False)
+        COLOCATION_DF.to_csv(self.path('colocated_points.csv'), index=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.data_directory, name)
+
+    def make_older(self, name, seconds=60):
+        stat = os.stat(self.path(name))
+        os.utime(self.path(name), ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 10**9))
+
+    def test_coverage_counts(self):
+        coverage = PickupPointQueries(self.data_directory).coverage().set_index('city_code')
+        self.assertEqual(coverage.loc[505927, ['point_count', 'posta_count', 'alzabox_count', 'zasilkovna_count', 'location_count']].tolist(), [6, 4, 1, 1, 2])
+        self.assertEqual(coverage.loc[582786, ['point_count', 'location_count']].tolist(), [2, 1])
+
+    def test_coverage_points_do_not_depend_on_colocation(self):
+        count_columns = ['city_code', 'point_count', 'posta_count', 'alzabox_count', 'zasilkovna_count']
+        with_colocation = PickupPointQueries(self.data_directory).coverage()
+        without_colocation = PickupPointQueries(self.data_directory, use_colocation=False).coverage()
+        self.assertIn('location_count', with_colocation.columns)
+        self.assertNotIn('location_count', without_colocation.columns)
+        pd.testing.assert_frame_equal(with_colocation[count_columns], without_colocation[count_columns])
+
+    def test_stale_colocation_is_ignored(self):
+        self.make_older('colocated_points.csv')
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            coverage = PickupPointQueries(self.data_directory).coverage()
+        self.assertNotIn('location_count', coverage.columns)
+        self.assertIn('Ignoring', output.getvalue())
+
+    def test_newer_file_is_used(self):
+        df = POSTA_DF.iloc[:1]
+        df.to_csv(self.path('posta_enriched.arrow'), index=False)  # only the modification time matters here
+        self.make_older('posta_enriched.arrow')
+        self.assertEqual(find_dataset_file(self.data_directory, 'posta_enriched'), self.path('posta_enriched.csv'))
+        self.make_older('posta_enriched.csv', seconds=120)
+        self.assertEqual(find_dataset_file(self.data_directory, 'posta_enriched'), self.path('posta_enriched.arrow'))
+
+    def test_points_by_city_code(self):
+        points = PickupPointQueries(self.data_directory).points_by_city_code(505927, 'posta')
+        self.assertEqual(points['point_id'].tolist(), ['74601', '74602', '74603', '74604'])
+
+    def test_missing_dataset(self):
+        os.remove(self.path('posta_enriched.csv'))
+        with self.assertRaises(FileNotFoundError):
+            PickupPointQueries(self.data_directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+tests of the streaming AMD -> kod_obce lookup (data_cleaning/ruian_client.py) and the benchmark stub server
+run from the obce_vybavenost directory:
+    python -m unittest discover -s tests
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_cleaning'))
+
+from ruian_benchmark import fetch_sequential, fetch_streaming, generate_page, start_stub_server  # noqa: E402
+from ruian_client import STREAM_OVERLAP, extract_city_code_from_stream, get_city_code_by_ruian_code  # noqa: E402
+
+
+def split_at(page, *positions):
+    """ Split the page into chunks at the given positions """
+    bounds = [0, *positions, len(page)]
+    return [page[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class ExtractCityCodeFromStreamTest(unittest.TestCase):
+    page = b'<ul><li><a href="/vdp/ruian/obce/vyhledej">obce</a></li></ul><a href="/vdp/ruian/obce/505927">Opava</a><p>rest</p>'
+
+    def test_every_split_into_two_chunks(self):
+        for position in range(len(self.page) + 1):
+            city_code, _ = extract_city_code_from_stream(split_at(self.page, position))
+            self.assertEqual(city_code, 505927, f"split at {position}")
+
+    def test_chunks_of_every_size(self):
+        for size in range(1, len(self.page) + 1):
+            chunks = [self.page[start:start + size] for start in range(0, len(self.page), size)]
+            self.assertEqual(extract_city_code_from_stream(chunks)[0], 505927, f"chunks of {size} bytes")
+
+    def test_match_ending_exactly_at_chunk_end(self):
+        # "/obce/5059" at the end of the first chunk must not be taken for the whole code
+        position = self.page.index(b'505927') + len(b'5059')
+        self.assertEqual(extract_city_code_from_stream(split_at(self.page, position))[0], 505927)
+
+    def test_page_ending_right_after_the_digits(self):
+        page = b'<a href="/vdp/ruian/obce/505927'
+        self.assertEqual(extract_city_code_from_stream(split_at(page, len(page) - 2)), (505927, page))
+
+    def test_link_split_across_the_overlap(self):
+        # the link starts in a chunk before the last one, the overlap window keeps its beginning
+        padding = b'x' * (3 * STREAM_OVERLAP)
+        page = padding + self.page
+        position = len(padding) + self.page.index(b'ruian/obce')
+        self.assertEqual(extract_city_code_from_stream(split_at(page, position - 1, position + 3))[0], 505927)
+
+    def test_no_link(self):
+        page = b'<html><a href="/vdp/ruian/obce/vyhledej">obce</a></html>'
+        self.assertEqual(extract_city_code_from_stream(split_at(page, 10, 20)), (None, page))
+
+    def test_empty_chunks_are_skipped(self):
+        self.assertEqual(extract_city_code_from_stream([b'', self.page, b''])[0], 505927)
+
+    def test_stops_reading_after_the_match(self):
+        def chunks():
+            yield self.page
+            raise AssertionError("read past the match")
+
+        city_code, body = extract_city_code_from_stream(chunks())
+        self.assertEqual((city_code, body), (505927, self.page))
+
+
+class StubServerTest(unittest.TestCase):
+    city_codes = {11694246: 505781, 11696664: 538167, 22623701: 554782}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pages_directory = tempfile.TemporaryDirectory()
+        for ruian_code, city_code in cls.city_codes.items():
+            with open(os.path.join(cls.pages_directory.name, f"{ruian_code}.html"), "wb") as f:
+                f.write(generate_page(ruian_code, city_code))
+        cls.server, cls.url_template = start_stub_server(cls.pages_directory.name, latency=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.pages_directory.cleanup()
+
+    def test_streaming_fetch(self):
+        ruian_codes = list(self.city_codes)
+        for max_workers in [1, 4]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                city_codes = fetch_streaming(ruian_codes, self.url_template, max_workers=max_workers)
+            self.assertEqual(city_codes, list(self.city_codes.values()))
+
+    def test_sequential_fetch(self):
+        self.assertEqual(fetch_sequential(list(self.city_codes), self.url_template), list(self.city_codes.values()))
+
+    def test_missing_page(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(get_city_code_by_ruian_code(12345, self.url_template))
+
+
+if __name__ == "__main__":
+    unittest.main()